@@ -463,22 +463,25 @@ class SmartWatchScraper:
         enhanced_count = 0
         for watch in new_watches:
             try:
-                enhanced_watch, success = enhancer.enhance_watch_with_ai(watch)
-                
+                update_fields, success = enhancer.enhance_watch_with_ai(watch)
+
                 if success:
-                    result = self.collection.replace_one(
+                    # enhance_watch_with_ai returns only the AI fields, so
+                    # $set them - replace_one here would wipe the rest of
+                    # the product document (name, price, image_urls, ...)
+                    result = self.collection.update_one(
                         {'_id': watch['_id']},
-                        enhanced_watch
+                        {'$set': update_fields}
                     )
-                    
+
                     if result.modified_count > 0:
                         enhanced_count += 1
                         logging.info(f"✅ Enhanced: {watch.get('name', 'Unknown')}")
-                        
+
                         # Log enhanced fields for monitoring
-                        colors = enhanced_watch.get('colors', [])
-                        category = enhanced_watch.get('ai_category', 'N/A')
-                        belt_type = enhanced_watch.get('belt_type', 'N/A')
+                        colors = update_fields.get('colors', [])
+                        category = update_fields.get('ai_category', 'N/A')
+                        belt_type = update_fields.get('belt_type', 'N/A')
                         logging.info(f"   Fields: {colors[:2]} | {category} | {belt_type}")
                 
                 time.sleep(1.5)  # Rate limiting for API
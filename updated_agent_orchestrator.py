@@ -1,221 +1,533 @@
-"""
-Enhanced Agent Orchestrator with WhatsApp Image Sending
-Handles MongoDB vector search and sends actual product images
-"""
-
-import json
-import logging
-import os
-from datetime import datetime
-from typing import Dict, List, Any
-from conversation_agent import ConversationAgent
-from google_apps_script_handler import GoogleSheetsHandler
-from enhanced_backend_tool_classifier import BackendToolClassifier
-# WhatsApp functions imported as needed
-
-logger = logging.getLogger(__name__)
-
-class AgentOrchestrator:
-    """
-    Enhanced orchestrator that coordinates between conversation agent and vector search
-    Sends actual product images via WhatsApp webhook
-    """
-    
-    def __init__(self):
-        """Initialize the enhanced agent orchestrator"""
-        self.conversation_agent = ConversationAgent()
-        self.google_sheets_handler = GoogleSheetsHandler()
-        
-        # Evolution API functions will be imported as needed
-        logger.info("✅ Evolution API functions ready for use")
-        
-        # Search context tracking
-        self.search_contexts = {}
-        
-        logger.info("Enhanced Agent Orchestrator with Image Sending initialized")
-
-    def process_message(self, conversation_history: List[Dict], user_message: str, phone_number: str) -> Dict:
-        """
-        Main orchestration method - processes user message and coordinates response
-        Now handles vector search with actual image sending
-        """
-        try:
-            logger.info(f"📨 Processing message from {phone_number}: {user_message[:100]}...")
-            
-            # Initialize enhanced classifier
-            classifier = BackendToolClassifier()
-            
-            # Classify and search using vector search system
-            classification = classifier.classify_and_search(
-                user_message,
-                conversation_history,
-                {}
-            )
-            
-            tool = classification.get('tool', 'ai_chat')
-            logger.info(f"🔍 Tool classified: {tool}")
-            
-            # Handle product search with image sending
-            if tool == 'product_search':
-                result = self._handle_vector_search_response(
-                    classification,
-                    conversation_history,
-                    user_message,
-                    phone_number
-                )
-                classifier.close()
-                return result
-            
-            # Handle general chat
-            else:
-                response = self.conversation_agent.generate_response(
-                    conversation_history,
-                    user_message,
-                    phone_number
-                )
-                
-                classifier.close()
-                return {
-                    "response": response,
-                    "timestamp": datetime.now().isoformat(),
-                    "tool_used": "ai_chat"
-                }
-                
-        except Exception as e:
-            logger.error(f"❌ Error in process_message: {e}")
-            return {
-                "response": "I'm having trouble processing your request. Please try again.",
-                "timestamp": datetime.now().isoformat(),
-                "tool_used": "error"
-            }
-
-    def _handle_vector_search_response(self, classification: dict, conversation_history: list, user_message: str, phone_number: str) -> dict:
-        """Handle vector search response by sending actual images via WhatsApp"""
-        try:
-            formatted_response = classification.get('formatted_response', {})
-            images_to_send = formatted_response.get('images_to_send', [])
-            summary_message = formatted_response.get('message', 'Found products for you!')
-            
-            if images_to_send:
-                logger.info(f"📱 Sending {len(images_to_send)} product images to {phone_number}")
-                
-                # Send actual product images via Evolution API
-                image_sent = False
-                
-                # Send summary message first using your Evolution API
-                from whatsapp_sender import send_whatsapp_text
-                try:
-                    send_whatsapp_text(phone_number, summary_message)
-                    logger.info(f"📤 Sent summary message")
-                except Exception as e:
-                    logger.error(f"❌ Error sending summary: {e}")
-                
-                # Send each product image with caption using your Evolution API
-                success_count = 0
-                for img_data in images_to_send:
-                    try:
-                        # Get image URL and convert to base64 for Evolution API
-                        image_url = img_data['image_url']
-                        caption = img_data['caption']
-                        
-                        # Download image and convert to base64
-                        import requests
-                        import base64
-                        
-                        img_response = requests.get(image_url, timeout=10)
-                        if img_response.status_code == 200:
-                            image_base64 = base64.b64encode(img_response.content).decode('utf-8')
-                            
-                            # Use your existing Evolution API function
-                            from whatsapp_sender import send_whatsapp_image
-                            result = send_whatsapp_image(phone_number, image_base64, caption)
-                            
-                            if result.get('success', False):
-                                success_count += 1
-                                logger.info(f"✅ Sent image for {img_data.get('product_name', 'Product')}")
-                            else:
-                                logger.error(f"❌ Evolution API failed for {img_data.get('product_name', 'Product')}")
-                        else:
-                            logger.error(f"❌ Failed to download image: {image_url}")
-                        
-                        # Small delay between images
-                        import time
-                        time.sleep(1)
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Error sending image for {img_data.get('product_name', 'Product')}: {e}")
-                        continue
-                
-                image_sent = success_count > 0
-                logger.info(f"📱 Evolution API sent {success_count}/{len(images_to_send)} images")
-                
-                if image_sent:
-                    response_text = f"✅ Found {len(images_to_send)} watches! Sent images with prices and shop links."
-                    logger.info(f"✅ Successfully sent {len(images_to_send)} product images")
-                else:
-                    # Fallback to text response with image URLs and details
-                    response_parts = [f"Found {len(images_to_send)} watches for you:"]
-                    for i, img_data in enumerate(images_to_send, 1):
-                        response_parts.append(f"\n{i}. {img_data['caption']}")
-                        response_parts.append(f"📸 Image: {img_data['image_url']}")
-                    
-                    response_text = "\n".join(response_parts)
-                    logger.warning("📱 Image sending failed, using text fallback")
-                
-                return {
-                    "response": response_text,
-                    "timestamp": datetime.now().isoformat(),
-                    "tool_used": "vector_search_with_images",
-                    "images_sent": image_sent,
-                    "products_count": len(images_to_send),
-                    "images_data": images_to_send  # Include for external processing
-                }
-            else:
-                # No images found
-                response = "Sorry, I couldn't find any watches with images matching your search. Please try different terms like 'black watch', 'Rolex', or 'luxury watch'."
-                
-                return {
-                    "response": response,
-                    "timestamp": datetime.now().isoformat(),
-                    "tool_used": "vector_search_no_results"
-                }
-                
-        except Exception as e:
-            logger.error(f"❌ Error handling vector search response: {e}")
-            
-            # Fallback response
-            return {
-                "response": "I found some watches for you, but had trouble sending the images. Please try again.",
-                "timestamp": datetime.now().isoformat(),
-                "tool_used": "vector_search_error"
-            }
-    
-    def get_search_context(self, phone_number: str) -> Dict:
-        """Get search context for user"""
-        return self.search_contexts.get(phone_number, {})
-    
-    def update_search_context(self, phone_number: str, context: Dict):
-        """Update search context for user"""
-        self.search_contexts[phone_number] = context
-
-    def save_order_to_sheets(self, order_data: Dict) -> Dict:
-        """Save order data to Google Sheets"""
-        try:
-            result = self.google_sheets_handler.save_order(order_data)
-            if result.get('success'):
-                return {
-                    "success": True,
-                    "order_id": result.get('order_id'),
-                    "message": "Order saved successfully!"
-                }
-            else:
-                return {
-                    "success": False,
-                    "message": "Failed to save order."
-                }
-        except Exception as e:
-            logger.error(f"Error saving order: {e}")
-            return {
-                "success": False,
-                "message": "Error saving order."
+"""
+Enhanced Agent Orchestrator with WhatsApp Image Sending
+Handles MongoDB vector search and sends actual product images
+"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import threading
+import time
+from collections import OrderedDict
+
+import aiohttp
+import cachetools
+import numpy as np
+import orjson
+from conversation_agent import ConversationAgent
+from google_apps_script_handler import GoogleSheetsHandler
+from enhanced_backend_tool_classifier import BackendToolClassifier
+from whatsapp_sender import send_whatsapp_text, send_whatsapp_images
+
+logger = logging.getLogger(__name__)
+
+# URL -> base64 payload cache: hot products returned to many users (or
+# repeatedly to one) skip the download and encode entirely for an hour
+_IMAGE_B64_CACHE = cachetools.TTLCache(maxsize=512, ttl=3600)
+_IMAGE_CACHE_LOCK = threading.Lock()
+
+# pybase64 encodes with SIMD kernels (~4-6x stdlib on image-sized
+# payloads) and returns the string directly, skipping the intermediate
+# bytes object; fall back to stdlib when it isn't installed
+try:
+    import pybase64
+
+    def _b64encode_str(data: bytes) -> str:
+        return pybase64.b64encode_as_string(data)
+except ImportError:
+    def _b64encode_str(data: bytes) -> str:
+        return base64.b64encode(data).decode('utf-8')
+
+# Canned replies for trivially routable messages: a dict lookup
+# instead of a multi-hundred-millisecond classifier + LLM round trip
+_GREETING_REPLY = (
+    "👋 Welcome to WatchVine! I can help you find the perfect watch.\n\n"
+    "Try asking for:\n"
+    "• 'black luxury watch'\n"
+    "• 'Rolex under 5000'\n"
+    "• 'sports watch for men'"
+)
+
+_MENU_REPLY = (
+    "📋 Here's what I can do:\n\n"
+    "1️⃣ Search watches - just describe what you want\n"
+    "2️⃣ Show prices and shop links\n"
+    "3️⃣ Send product images right here\n\n"
+    "What are you looking for?"
+)
+
+_THANKS_REPLY = "🙏 You're welcome! Ask me anytime for more watches."
+
+_FAST_INTENTS = {
+    'hi': _GREETING_REPLY,
+    'hello': _GREETING_REPLY,
+    'hey': _GREETING_REPLY,
+    'namaste': _GREETING_REPLY,
+    'hola': _GREETING_REPLY,
+    '/start': _GREETING_REPLY,
+    'menu': _MENU_REPLY,
+    'help': _MENU_REPLY,
+    'options': _MENU_REPLY,
+    'thanks': _THANKS_REPLY,
+    'thank you': _THANKS_REPLY,
+    'ok': _THANKS_REPLY,
+    'okay': _THANKS_REPLY,
+}
+
+# Sentence embedder for the semantic cache, loaded once on first use -
+# importing sentence-transformers at module import would slow every
+# process start even when the cache never gets exercised
+_EMBED_MODEL = None
+_EMBED_LOCK = threading.Lock()
+
+def _get_embedder():
+    global _EMBED_MODEL
+    if _EMBED_MODEL is None:
+        with _EMBED_LOCK:
+            if _EMBED_MODEL is None:
+                from sentence_transformers import SentenceTransformer
+                _EMBED_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
+    return _EMBED_MODEL
+
+class SemanticCache:
+    """Paraphrase cache for classifier output
+
+    "show me black watches" and "black watches please" embed nearly
+    identically, so a cosine-similarity lookup over recent queries lets
+    paraphrases reuse the prior classification (tool + formatted
+    response) instead of re-running the embedding + vector search
+    pipeline. Entries expire after ttl seconds.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl: int = 600,
+                 max_entries: int = 256):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.vectors = np.empty((0, 384), dtype=np.float32)
+        self.entries = []  # (timestamp, classification dict)
+        self.lock = threading.Lock()
+
+    def _expire(self):
+        now = time.time()
+        keep = [i for i, (ts, _) in enumerate(self.entries)
+                if now - ts < self.ttl]
+        if len(keep) != len(self.entries):
+            self.vectors = self.vectors[keep]
+            self.entries = [self.entries[i] for i in keep]
+
+    def lookup(self, query_vec):
+        """Return the cached classification for a near-duplicate query"""
+        with self.lock:
+            self._expire()
+            if not self.entries:
+                return None
+            similarities = self.vectors @ query_vec
+            best = int(similarities.argmax())
+            if similarities[best] >= self.threshold:
+                return self.entries[best][1]
+        return None
+
+    def store(self, query_vec, classification: dict):
+        with self.lock:
+            self._expire()
+            if len(self.entries) >= self.max_entries:
+                self.vectors = self.vectors[1:]
+                self.entries.pop(0)
+            self.vectors = np.vstack([self.vectors,
+                                      query_vec[np.newaxis, :].astype(np.float32)])
+            self.entries.append((time.time(), classification))
+
+class AgentOrchestrator:
+    """
+    Enhanced orchestrator that coordinates between conversation agent and vector search
+    Sends actual product images via WhatsApp webhook
+    """
+    
+    def __init__(self):
+        """Initialize the enhanced agent orchestrator"""
+        self.conversation_agent = ConversationAgent()
+        self.google_sheets_handler = GoogleSheetsHandler()
+
+        # One classifier for the life of the process: its constructor
+        # opens MongoDB connections and warms the vector search stack,
+        # far too expensive to repeat per incoming message
+        self.classifier = BackendToolClassifier()
+        
+        # Evolution API functions will be imported as needed
+        logger.info("✅ Evolution API functions ready for use")
+        
+        # Search context tracking - bounded with a TTL so thousands of
+        # one-off users can't grow memory without limit; entries expire
+        # after a day. With REDIS_URL set, contexts are mirrored to
+        # Redis so they survive restarts and can be shared by workers.
+        self.search_contexts = cachetools.TTLCache(maxsize=10_000, ttl=86400)
+        self._redis = None
+        redis_url = os.getenv('REDIS_URL')
+        if redis_url:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(redis_url)
+                logger.info("✅ Search contexts backed by Redis")
+            except Exception as e:
+                logger.warning("⚠️ Redis unavailable, using in-memory contexts: %s", e)
+
+        # Exact-match reply cache: repeated small talk ("hi", "menu",
+        # "thanks") skips the Gemini round trip entirely. Keyed on the
+        # normalized message plus a history-length bucket so replies
+        # that depend on conversation depth don't go stale. Disable
+        # with CONVO_CACHE_ENABLED=0.
+        self._convo_cache_enabled = os.getenv('CONVO_CACHE_ENABLED', '1') == '1'
+        self._convo_cache = OrderedDict()
+        self._convo_cache_max = 2048
+        self._convo_cache_lock = threading.Lock()
+
+        # Per-phone semantic caches, so one user's paraphrase can never
+        # replay another user's results. Bounded with a TTL like
+        # search_contexts: each cache can hold hundreds of KB of
+        # embeddings, so thousands of one-off users must age out
+        self._semantic_caches = cachetools.TTLCache(maxsize=1_000, ttl=86400)
+
+        # (phone, image_url) pairs sent in the last 10 minutes: two
+        # consecutive searches returning the same watch shouldn't
+        # re-download and re-send identical bytes
+        self._recently_sent = cachetools.TTLCache(maxsize=50_000, ttl=600)
+        
+        logger.info("Enhanced Agent Orchestrator with Image Sending initialized")
+
+    def process_message(self, conversation_history: List[Dict], user_message: str, phone_number: str) -> Dict:
+        """
+        Main orchestration method - processes user message and coordinates response
+        Now handles vector search with actual image sending
+        """
+        try:
+            # %-style args are only interpolated if the record is
+            # actually emitted, so disabled levels cost nothing per call
+            logger.info("📨 Processing message from %s: %.100s...", phone_number, user_message)
+
+            # Deterministic router first: greetings, menu picks and
+            # thank-yous get a canned reply without touching the
+            # classifier, the vector search or Gemini at all
+            fast_reply = _FAST_INTENTS.get(user_message.strip().lower())
+            if fast_reply is not None:
+                logger.info("⚡ Fast intent matched, skipping classifier")
+                return {
+                    "response": fast_reply,
+                    "timestamp": datetime.now(),
+                    "tool_used": "fast_intent"
+                }
+
+            # Semantic cache first: a paraphrase of a recent query from
+            # the same user reuses the prior classification wholesale
+            query_vec = None
+            semantic_cache = None
+            classification = None
+            try:
+                query_vec = _get_embedder().encode(
+                    user_message.strip().lower(), normalize_embeddings=True
+                )
+                semantic_cache = self._semantic_caches.setdefault(
+                    phone_number, SemanticCache()
+                )
+                classification = semantic_cache.lookup(query_vec)
+                if classification is not None:
+                    logger.info("🗃️ Semantic cache hit for %s", phone_number)
+            except Exception as e:
+                logger.warning("⚠️ Semantic cache unavailable: %s", e)
+
+            if classification is None:
+                # Classify and search using vector search system
+                classification = self.classifier.classify_and_search(
+                    user_message,
+                    conversation_history,
+                    {}
+                )
+                if query_vec is not None and semantic_cache is not None:
+                    semantic_cache.store(query_vec, classification)
+            
+            tool = classification.get('tool', 'ai_chat')
+            logger.info("🔍 Tool classified: %s", tool)
+            
+            # Handle product search with image sending
+            if tool == 'product_search':
+                return self._handle_vector_search_response(
+                    classification,
+                    conversation_history,
+                    user_message,
+                    phone_number
+                )
+            
+            # Handle general chat
+            else:
+                response = self._cached_conversation_reply(
+                    conversation_history,
+                    user_message,
+                    phone_number
+                )
+                
+                return {
+                    "response": response,
+                    "timestamp": datetime.now(),
+                    "tool_used": "ai_chat"
+                }
+                
+        except Exception as e:
+            logger.error("❌ Error in process_message: %s", e)
+            return {
+                "response": "I'm having trouble processing your request. Please try again.",
+                "timestamp": datetime.now(),
+                "tool_used": "error"
+            }
+
+    def _cached_conversation_reply(self, conversation_history: List[Dict],
+                                   user_message: str, phone_number: str) -> str:
+        """Generate a chat reply, reusing cached answers for repeat prompts"""
+        if not self._convo_cache_enabled:
+            return self.conversation_agent.generate_response(
+                conversation_history, user_message, phone_number
+            )
+
+        history_bucket = len(conversation_history or []) // 5
+        key = hashlib.sha1(
+            f"{user_message.strip().lower()}||{history_bucket}".encode()
+        ).hexdigest()
+
+        with self._convo_cache_lock:
+            if key in self._convo_cache:
+                self._convo_cache.move_to_end(key)
+                logger.info("🗃️ Conversation cache hit (%d entries)", len(self._convo_cache))
+                return self._convo_cache[key]
+
+        response = self.conversation_agent.generate_response(
+            conversation_history, user_message, phone_number
+        )
+
+        with self._convo_cache_lock:
+            self._convo_cache[key] = response
+            self._convo_cache.move_to_end(key)
+            while len(self._convo_cache) > self._convo_cache_max:
+                self._convo_cache.popitem(last=False)
+
+        return response
+
+    async def _fetch_images(self, image_urls: list) -> list:
+        """Download all image URLs concurrently, bounded to 8 in flight
+
+        Returns bytes (or None on failure) in the same order as the
+        input, so callers can zip results back to their captions.
+        """
+        semaphore = asyncio.Semaphore(8)
+
+        async def fetch(session, url):
+            async with semaphore:
+                try:
+                    async with session.get(
+                        url, timeout=aiohttp.ClientTimeout(total=10)
+                    ) as response:
+                        if response.status == 200:
+                            return await response.read()
+                        logger.error("❌ Failed to download image: %s", url)
+                except Exception as e:
+                    logger.error("❌ Error downloading image %s: %s", url, e)
+                return None
+
+        connector = aiohttp.TCPConnector(limit=8)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            return await asyncio.gather(*[fetch(session, url)
+                                          for url in image_urls])
+
+    def _handle_vector_search_response(self, classification: dict, conversation_history: list, user_message: str, phone_number: str) -> dict:
+        """Handle vector search response by sending actual images via WhatsApp"""
+        try:
+            formatted_response = classification.get('formatted_response', {})
+            images_to_send = formatted_response.get('images_to_send', [])
+            summary_message = formatted_response.get('message', 'Found products for you!')
+
+            # Drop images this user already received moments ago - saves
+            # the download, the encode and the Evolution round trip
+            original_count = len(images_to_send)
+            images_to_send = [
+                img_data for img_data in images_to_send
+                if (phone_number, img_data['image_url']) not in self._recently_sent
+            ]
+            skipped = original_count - len(images_to_send)
+            if skipped:
+                logger.info("🔁 Skipped %d recently-sent images for %s", skipped, phone_number)
+
+            if not images_to_send and original_count:
+                return {
+                    "response": "☝️ I just sent you these watches above! Try different search terms for more options.",
+                    "timestamp": datetime.now(),
+                    "tool_used": "vector_search_already_sent"
+                }
+
+            if images_to_send:
+                logger.info("📱 Sending %d product images to %s", len(images_to_send), phone_number)
+                
+                # Send actual product images via Evolution API
+                image_sent = False
+                
+                # Send the summary in the background so its Evolution
+                # round trip overlaps the image downloads instead of
+                # delaying them
+                def _send_summary():
+                    try:
+                        send_whatsapp_text(phone_number, summary_message)
+                        logger.info("📤 Sent summary message")
+                    except Exception as e:
+                        logger.error("❌ Error sending summary: %s", e)
+
+                summary_thread = threading.Thread(target=_send_summary, daemon=True)
+                summary_thread.start()
+
+                # Phase 1: resolve each image to its base64 payload.
+                # Best case the product doc carries a pre-encoded
+                # image_b64 from enhancement time (pure DB read, nothing
+                # to download or encode); otherwise serve repeats from
+                # the TTL cache and download only the misses concurrently
+                urls = [img_data['image_url'] for img_data in images_to_send]
+                resolved = {img_data['image_url']: img_data['image_b64']
+                            for img_data in images_to_send
+                            if img_data.get('image_b64')}
+                with _IMAGE_CACHE_LOCK:
+                    for url in urls:
+                        if url not in resolved and url in _IMAGE_B64_CACHE:
+                            resolved[url] = _IMAGE_B64_CACHE[url]
+
+                miss_urls = [url for url in urls if url not in resolved]
+                if miss_urls:
+                    fetched = asyncio.run(self._fetch_images(miss_urls))
+                    for url, image_bytes in zip(miss_urls, fetched):
+                        if image_bytes:
+                            encoded = _b64encode_str(image_bytes)
+                            with _IMAGE_CACHE_LOCK:
+                                _IMAGE_B64_CACHE[url] = encoded
+                            resolved[url] = encoded
+
+                logger.info("🗃️ Image cache: %d hits, %d misses, %d cached",
+                            len(urls) - len(miss_urls), len(miss_urls),
+                            len(_IMAGE_B64_CACHE))
+
+                # Keep WhatsApp ordering: let the summary land before
+                # the first image goes out
+                summary_thread.join(timeout=10)
+
+                # Phase 2: hand the whole burst to the sender's batch
+                # dispatch - one pooled connection, Retry-After honored
+                payloads = [(resolved[url], img_data['caption'])
+                            for img_data, url in zip(images_to_send, urls)
+                            if url in resolved]
+
+                success_count = 0
+                if payloads:
+                    success_count = send_whatsapp_images(phone_number, payloads)
+
+                # Only remember the burst when everything went out; a
+                # partial failure stays eligible for a clean retry
+                if payloads and success_count == len(payloads):
+                    for img_data in images_to_send:
+                        self._recently_sent[(phone_number, img_data['image_url'])] = True
+                
+                image_sent = success_count > 0
+                logger.info("📱 Evolution API sent %d/%d images", success_count, len(images_to_send))
+                
+                if image_sent:
+                    response_text = f"✅ Found {len(images_to_send)} watches! Sent images with prices and shop links."
+                    logger.info("✅ Successfully sent %d product images", len(images_to_send))
+                else:
+                    # Fallback to text response with image URLs and details
+                    response_parts = [f"Found {len(images_to_send)} watches for you:"]
+                    for i, img_data in enumerate(images_to_send, 1):
+                        response_parts.append(f"\n{i}. {img_data['caption']}")
+                        response_parts.append(f"📸 Image: {img_data['image_url']}")
+                    
+                    response_text = "\n".join(response_parts)
+                    logger.warning("📱 Image sending failed, using text fallback")
+                
+                return {
+                    "response": response_text,
+                    "timestamp": datetime.now(),
+                    "tool_used": "vector_search_with_images",
+                    "images_sent": image_sent,
+                    "products_count": len(images_to_send),
+                    "images_data": images_to_send  # Include for external processing
+                }
+            else:
+                # No images found
+                response = "Sorry, I couldn't find any watches with images matching your search. Please try different terms like 'black watch', 'Rolex', or 'luxury watch'."
+                
+                return {
+                    "response": response,
+                    "timestamp": datetime.now(),
+                    "tool_used": "vector_search_no_results"
+                }
+                
+        except Exception as e:
+            logger.error("❌ Error handling vector search response: %s", e)
+            
+            # Fallback response
+            return {
+                "response": "I found some watches for you, but had trouble sending the images. Please try again.",
+                "timestamp": datetime.now(),
+                "tool_used": "vector_search_error"
+            }
+    
+    def close(self):
+        """Close the long-lived classifier and its connections"""
+        self.classifier.close()
+
+    def get_search_context(self, phone_number: str) -> Dict:
+        """Get search context for user"""
+        context = self.search_contexts.get(phone_number)
+        if context is not None:
+            return context
+
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(f"search_context:{phone_number}")
+                if raw:
+                    context = orjson.loads(raw)
+                    self.search_contexts[phone_number] = context
+                    return context
+            except Exception as e:
+                logger.warning("⚠️ Redis read failed: %s", e)
+
+        return {}
+    
+    def update_search_context(self, phone_number: str, context: Dict):
+        """Update search context for user"""
+        self.search_contexts[phone_number] = context
+
+        if self._redis is not None:
+            try:
+                self._redis.set(f"search_context:{phone_number}",
+                                orjson.dumps(context), ex=86400)
+            except Exception as e:
+                logger.warning("⚠️ Redis write failed: %s", e)
+
+    def save_order_to_sheets(self, order_data: Dict) -> Dict:
+        """Save order data to Google Sheets"""
+        try:
+            result = self.google_sheets_handler.save_order(order_data)
+            if result.get('success'):
+                return {
+                    "success": True,
+                    "order_id": result.get('order_id'),
+                    "message": "Order saved successfully!"
+                }
+            else:
+                return {
+                    "success": False,
+                    "message": "Failed to save order."
+                }
+        except Exception as e:
+            logger.error("Error saving order: %s", e)
+            return {
+                "success": False,
+                "message": "Error saving order."
             }
\ No newline at end of file